@@ -22,33 +22,49 @@ Arguments:
     -bc              Build then clean.
     -cb              Clean then build.
     -o NAME          Rename final PDF.
+    -j N             Build up to N main files in parallel (default 1).
     -v               Verbose debug logging.
 
 Configuration File (.pdfmake):
     key=value format. Comments start with #.
     
     main=main.tex
+    # Several main files may be listed: main=paper.tex, slides.tex
+    # They are built one after another unless -j is given. Only use -j when
+    # the targets do not \include the same files: each target writes the
+    # .aux of every included file into the shared directory.
     out=FinalPaper
     compiler=xelatex
     # Simple comma-separated list for tool chain:
     tool_chain=xelatex, biber, xelatex, xelatex
 """
+import io
 import os
+import glob
+import shutil
 import subprocess
 import argparse
 import sys
 import re
+import shlex
 import time
+import threading
+import collections
+import functools
+import hashlib
+import concurrent.futures
 from pathlib import Path
 
 try:
     from watchdog.observers import Observer
-    from watchdog.events import FileSystemEventHandler
+    from watchdog.events import PatternMatchingEventHandler
 except ImportError:
     print(f"Error: 'watchdog' library not found. Please run 'pip install watchdog'", file=sys.stderr)
     sys.exit(1)
 
 VERBOSE = False
+# Only the tail of a tool's log is kept for the error summary.
+LOG_TAIL_LINES = 4096
 
 class Colors:
     HEADER = '\033[95m'
@@ -65,16 +81,19 @@ def debug(msg):
         print(f"{Colors.BLUE}[DEBUG] {msg}{Colors.ENDC}", file=sys.stderr)
 
 TOOL_MAP = {
-    "pdflatex": "pdflatex -file-line-error -interaction=nonstopmode {file}.tex",
-    "xelatex":  "xelatex -file-line-error -interaction=nonstopmode {file}.tex",
-    "lualatex": "lualatex -file-line-error -interaction=nonstopmode {file}.tex",
-    "latex":    "latex -file-line-error -interaction=nonstopmode {file}.tex",
-    "dvipdfmx": "dvipdfmx {file}",
-    "biber":    "biber {file}",
-    "bibtex":   "bibtex {file}",
-    "makeglossaries": "makeglossaries {file}"
+    "pdflatex": ["pdflatex", "-file-line-error", "-interaction=nonstopmode", "{file}.tex"],
+    "xelatex":  ["xelatex", "-file-line-error", "-interaction=nonstopmode", "{file}.tex"],
+    "lualatex": ["lualatex", "-file-line-error", "-interaction=nonstopmode", "{file}.tex"],
+    "latex":    ["latex", "-file-line-error", "-interaction=nonstopmode", "{file}.tex"],
+    "dvipdfmx": ["dvipdfmx", "{file}"],
+    "biber":    ["biber", "{file}"],
+    "bibtex":   ["bibtex", "{file}"],
+    "makeglossaries": ["makeglossaries", "{file}"]
 }
 
+_DEFAULT_CHAINS = {c: (c, "biber", c, c) for c in ("pdflatex", "xelatex", "lualatex")}
+_DEFAULT_CHAINS["latex"] = ("latex", "biber", "latex", "latex", "dvipdfmx")
+
 clean_files = [
     "*.aux", "*.bbl", "*.blg", "*.dvi", "*.out", "*.log", "*.toc",
     "*.lof", "*.lot", "build/", "*.synctex.gz", "*.fls",
@@ -82,6 +101,26 @@ clean_files = [
     "*.nav", "*.snm"
 ]
 
+# Sources that trigger a rebuild in watch mode; LaTeX's own outputs are ignored
+# so a build never re-triggers itself.
+watch_patterns = ["*.tex", "*.bib", "*.cls", "*.sty"]
+watch_ignore_patterns = [
+    "*.pdf", "*.aux", "*.log", "*.toc", "*.bbl", "*.blg", "*.out", "*.fls",
+    "*.fdb_latexmk", "*.synctex.gz", "*.bcf", "*.run.xml", "*.nav", "*.snm",
+    "*.lof", "*.lot", "*.glg", "*.gls", "*.glsdefs", "*.ist"
+]
+
+# One `key = value  # comment` entry per line of .pdfmake.
+_CFG_RE = re.compile(r'^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*([^#\n]*?)[ \t]*(?:#.*)?$', re.MULTILINE)
+_LIST_KEYS = ('tool_chain', 'main', 'out')
+
+_FILE_LINE_RE = re.compile(r'^.+?:\d+:')
+_TEX_MAGIC_RE = re.compile(
+    # [ \t] rather than \s, so a match never runs across a line break.
+    r'^%[ \t]*!TEX[ \t]+(?:(?:TS-)?program[ \t]*=[ \t]*([A-Za-z0-9]+)|(pdflatex|xelatex|lualatex|latex)\b)',
+    re.IGNORECASE | re.MULTILINE
+)
+
 def create_template_config():
     content = """# .pdfmake configuration file
 main=main.tex
@@ -99,61 +138,83 @@ main=main.tex
 def clean(rules=clean_files):
     print(f"{Colors.CYAN}Cleaning auxiliary files...{Colors.ENDC}")
     for pattern in rules:
-        subprocess.run(f"rm -rf {pattern}", shell=True, capture_output=True)
-
-def print_error_summary(stdout_content):
-    print(f"\n{Colors.FAIL}================ BUILD FAILED ================ {Colors.ENDC}")
+        # A trailing '/' means directories only, as with `rm -rf build/`.
+        dirs_only = pattern.endswith('/')
+        for path in glob.glob(pattern):
+            path = path.rstrip('/')
+            try:
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                elif not dirs_only:
+                    os.remove(path)
+            except OSError as e:
+                debug(f"Failed to remove {path}: {e}")
+
+def print_error_summary(stdout_content, out=None):
+    out = out or sys.stdout
+    print(f"\n{Colors.FAIL}================ BUILD FAILED ================ {Colors.ENDC}", file=out)
     found_error = False
     lines = stdout_content.splitlines()
-    file_line_pattern = re.compile(r'^.*:\d+:.*')
-    tex_error_pattern = re.compile(r'^! .*')
 
     for i, line in enumerate(lines):
-        if file_line_pattern.match(line) or tex_error_pattern.match(line):
-            print(f"{Colors.FAIL}>> {line}{Colors.ENDC}")
-            if tex_error_pattern.match(line) and i + 1 < len(lines) and lines[i+1].strip().startswith('l.'):
-                print(f"{Colors.CYAN}   {lines[i+1].strip()}{Colors.ENDC}")
+        # Cheap substring checks first; the regex only sees candidate lines.
+        is_tex = line.startswith('! ')
+        if is_tex or (':' in line and _FILE_LINE_RE.match(line)):
+            print(f"{Colors.FAIL}>> {line}{Colors.ENDC}", file=out)
+            if is_tex and i + 1 < len(lines) and lines[i+1].strip().startswith('l.'):
+                print(f"{Colors.CYAN}   {lines[i+1].strip()}{Colors.ENDC}", file=out)
             found_error = True
 
     if not found_error:
-        print(f"{Colors.WARNING}Last 20 lines:{Colors.ENDC}")
-        print('\n'.join(lines[-20:]))
-    print(f"{Colors.FAIL}============================================== {Colors.ENDC}")
+        print(f"{Colors.WARNING}Last 20 lines:{Colors.ENDC}", file=out)
+        print('\n'.join(lines[-20:]), file=out)
+    print(f"{Colors.FAIL}============================================== {Colors.ENDC}", file=out)
 
 def detect_compiler(tex_file_path):
     debug(f"Detecting compiler from: {tex_file_path}")
     try:
-        with open(tex_file_path, 'r', encoding='utf-8') as f:
-            for i, line in enumerate(f):
-                if i > 20: break
-                m = re.match(r'%\s*!TEX\s+(?:TS-)?program\s*=\s*([a-zA-Z0-9]+)', line, re.IGNORECASE)
-                if m: return m.group(1).lower()
-                m2 = re.match(r'%\s*!TEX\s+(pdflatex|xelatex|lualatex|latex)\b', line, re.IGNORECASE)
-                if m2: return m2.group(1).lower()
+        mtime_ns = os.stat(tex_file_path).st_mtime_ns
+    except OSError:
+        return "pdflatex"
+    # Keyed on mtime so watch-mode rebuilds only re-scan the header after an edit.
+    return _detect_compiler_cached(tex_file_path, mtime_ns)
+
+@functools.lru_cache(maxsize=64)
+def _detect_compiler_cached(tex_file_path, mtime_ns):
+    try:
+        # Magic comments live in the file header; only scan the first 2 KB.
+        with open(tex_file_path, 'rb') as f:
+            head = f.read(2048).decode('utf-8', 'replace')
+        m = _TEX_MAGIC_RE.search(head)
+        if m: return (m.group(1) or m.group(2)).lower()
     except Exception:
         pass
     return "pdflatex"
 
-def generate_build_rules(config, tex_file_path):
+def generate_build_rules(config, tex_file_path, file_basename, out=None):
+    out = out or sys.stdout
     # 1. 获取基础编译器（检测 或 配置指定）
     detected = detect_compiler(tex_file_path)
     compiler = config.get('compiler', detected)
-
-    rules = []
-    chain_names = []
+    tool_chain = tuple(config.get('tool_chain') or ())
 
     # 2. 逻辑修正：优先判断是否存在 tool_chain
-    if 'tool_chain' in config and config['tool_chain']:
-        chain_names = config['tool_chain']
+    if tool_chain:
         # 如果定义了 tool_chain，打印它而不是打印默认编译器
-        print(f"{Colors.CYAN}Custom Tool Chain: {', '.join(chain_names)}{Colors.ENDC}")
+        print(f"{Colors.CYAN}Custom Tool Chain: {', '.join(tool_chain)}{Colors.ENDC}", file=out)
     else:
         # 只有没有 tool_chain 时，才打印检测到的编译器
-        print(f"Compiler: {Colors.GREEN}{compiler}{Colors.ENDC}")
-        if compiler == 'latex':
-            chain_names = [compiler, "biber", compiler, compiler, "dvipdfmx"]
-        else:
-            chain_names = [compiler, "biber", compiler, compiler]
+        print(f"Compiler: {Colors.GREEN}{compiler}{Colors.ENDC}", file=out)
+
+    return _generate_build_rules_cached(compiler, tool_chain, file_basename)
+
+@functools.lru_cache(maxsize=64)
+def _generate_build_rules_cached(compiler, tool_chain, file_basename):
+    rules = []
+    if tool_chain:
+        chain_names = tool_chain
+    else:
+        chain_names = _DEFAULT_CHAINS.get(compiler) or (compiler, "biber", compiler, compiler)
 
     # 3. 生成命令列表
     for tool in chain_names:
@@ -164,32 +225,57 @@ def generate_build_rules(config, tex_file_path):
             real_tool = tool
         
         # 如果工具在 MAP 里则取 MAP，否则认为是一个直接命令
-        rules.append(TOOL_MAP.get(real_tool, f"{real_tool} {{file}}"))
+        template = TOOL_MAP.get(real_tool) or shlex.split(real_tool) + ["{file}"]
+        rules.append(tuple(tok.replace("{file}", file_basename) for tok in template))
         
-    return rules
+    # Tuples, since the cached result is shared between rebuilds.
+    return tuple(rules)
+
+def run_tool(argv, out=None):
+    """Run one build step, streaming stdout into a bounded tail buffer.
 
-def build(file_basename, rules):
+    Output is returned as raw bytes; callers decode it only when needed.
+    """
+    out = out or sys.stdout
+    try:
+        proc = subprocess.Popen(argv, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        return 127, b'', f"{argv[0]}: {e.strerror}".encode()
+    # Drain stderr concurrently so a chatty tool cannot block on a full pipe.
+    stderr_chunks = []
+    stderr_reader = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+    stderr_reader.start()
+
+    tail = collections.deque(maxlen=LOG_TAIL_LINES)
+    for line in proc.stdout:
+        tail.append(line)
+        if VERBOSE:
+            out.write(line.decode('utf-8', 'replace'))
+    returncode = proc.wait()
+    stderr_reader.join()
+    return returncode, b''.join(tail), b''.join(stderr_chunks)
+
+def build(file_basename, rules, out=None):
+    out = out or sys.stdout
     if not Path(f"{file_basename}.tex").exists():
         print(f"{Colors.FAIL}Error: '{file_basename}.tex' not found.{Colors.ENDC}", file=sys.stderr)
         return False
     
     total = len(rules)
     for idx, rule in enumerate(rules):
-        cmd = rule.format(file=file_basename)
-        print(f"{Colors.BOLD}[{idx+1}/{total}]{Colors.ENDC} {cmd}")
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+        print(f"{Colors.BOLD}[{idx+1}/{total}]{Colors.ENDC} {' '.join(rule)}", file=out)
+        returncode, stdout, stderr = run_tool(rule, out)
         
-        if result.returncode != 0:
-            print_error_summary(result.stdout)
+        if returncode != 0:
+            print_error_summary(stdout.decode('utf-8', 'replace'), out)
             if VERBOSE:
-                print(f"\n{Colors.WARNING}------ FULL OUTPUT (STDOUT) ------{Colors.ENDC}")
-                print(result.stdout)
-                if result.stderr:
-                    print(f"\n{Colors.WARNING}------ STDERR ------{Colors.ENDC}")
-                    print(result.stderr, file=sys.stderr)
+                # The full stdout has already been streamed live above.
+                if stderr:
+                    print(f"\n{Colors.WARNING}------ STDERR ------{Colors.ENDC}", file=out)
+                    print(stderr.decode('utf-8', 'replace'), file=sys.stderr)
             else:
                 # 提示用户可以使用 -v
-                print(f"\n{Colors.CYAN}(Run with -v to see the full log){Colors.ENDC}")
+                print(f"\n{Colors.CYAN}(Run with -v to see the full log){Colors.ENDC}", file=out)
                 
             return False
     return True
@@ -199,16 +285,13 @@ def load_config(work_dir):
     config_path = Path(work_dir) / ".pdfmake"
     if config_path.is_file():
         try:
-            with open(config_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.split('#', 1)[0].strip()
-                    if not line or '=' not in line: continue
-                    key, val = line.split('=', 1)
-                    key, val = key.strip(), val.strip()
-                    if key in ['tool_chain', 'main', 'out']:
-                        val = val.replace('[', '').replace(']', '')
-                        val = [x.strip() for x in val.split(',') if x.strip()]
-                    config[key] = val
+            text = config_path.read_text(encoding='utf-8')
+            for m in _CFG_RE.finditer(text):
+                key, val = m.group(1), m.group(2)
+                if key in _LIST_KEYS:
+                    val = val.replace('[', '').replace(']', '')
+                    val = [x.strip() for x in val.split(',') if x.strip()]
+                config[key] = val
         except Exception as e:
             print(f"{Colors.WARNING}Warning: Failed to read .pdfmake: {e}{Colors.ENDC}", file=sys.stderr)
     return config
@@ -237,22 +320,67 @@ def resolve_target(target_path):
         return str(path.parent), [path.stem], load_config(path.parent)
     return None, None, {}
 
-class BuildHandler(FileSystemEventHandler):
+class BuildHandler(PatternMatchingEventHandler):
     def __init__(self, callback):
+        # Filtering happens inside watchdog's dispatcher, so aux-file churn
+        # never reaches on_any_event.
+        super().__init__(patterns=watch_patterns, ignore_patterns=watch_ignore_patterns,
+                         ignore_directories=True)
         self.callback = callback
-        self.last_triggered = 0
-        self.debounce_interval = 0.5  # seconds
+        self.debounce_interval = 0.5  # seconds, lets an editor's save burst settle
+        # At most one build runs at a time; events that arrive meanwhile are
+        # coalesced into a single trailing rebuild.
+        self._lock = threading.Lock()
+        self._pending = False
+        # Paths touched since the last build, and their content digests, so
+        # byte-identical saves do not trigger a rebuild.
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        self.digests = {}
 
     def on_any_event(self, event):
-        # Ignore changes to PDF files to avoid loops
-        if event.src_path.endswith('.pdf'):
+        # LaTeX opens the sources it reads; only react to actual changes.
+        if event.event_type not in ('created', 'modified', 'moved', 'deleted'):
             return
-            
-        current_time = time.time()
-        if current_time - self.last_triggered > self.debounce_interval:
-            self.last_triggered = current_time
-            print(f"\n{Colors.CYAN}--- Detected change in {event.src_path}, rebuilding ---{Colors.ENDC}")
-            self.callback()
+        with self._dirty_lock:
+            self._dirty.add(getattr(event, 'dest_path', '') or event.src_path)
+        self._pending = True
+        if self._lock.acquire(blocking=False):
+            threading.Thread(target=self._drain, daemon=True).start()
+
+    def _content_changed(self, path):
+        try:
+            digest = hashlib.blake2b(Path(path).read_bytes(), digest_size=16).digest()
+        except OSError:
+            # Deleted or unreadable: always worth a rebuild.
+            self.digests.pop(path, None)
+            return True
+        if self.digests.get(path) == digest:
+            return False
+        self.digests[path] = digest
+        return True
+
+    def _drain(self):
+        while True:
+            try:
+                while self._pending:
+                    time.sleep(self.debounce_interval)
+                    self._pending = False
+                    with self._dirty_lock:
+                        paths, self._dirty = self._dirty, set()
+                    # Hash only after the burst settled, so truncate-then-write
+                    # saves are compared in their final state.
+                    changed = [p for p in sorted(paths) if self._content_changed(p)]
+                    if not changed:
+                        debug(f"Skipping unchanged {', '.join(sorted(paths))}")
+                        continue
+                    print(f"\n{Colors.CYAN}--- Detected change in {', '.join(changed)}, rebuilding ---{Colors.ENDC}")
+                    self.callback()
+            finally:
+                self._lock.release()
+            # An event may have landed between the last check and the release.
+            if not (self._pending and self._lock.acquire(blocking=False)):
+                return
 
 def main():
     global VERBOSE
@@ -264,6 +392,8 @@ def main():
     parser.add_argument("-bc", "--build-clean", action="store_true")
     parser.add_argument("-cb", "--clean-build", action="store_true")
     parser.add_argument("-o", "--output", help="Rename output PDF (only for single target builds)")
+    parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                        help="Build up to N main files in parallel (only safe if they share no \\include'd files)")
     parser.add_argument("-v", "--verbose", action="store_true")
     parser.add_argument("-w", "--watch", action="store_true", help="Watch for file changes and rebuild automatically")
 
@@ -279,6 +409,75 @@ def main():
     original_cwd = Path.cwd()
     os.chdir(work_dir)
 
+    def run_job(job, out=None):
+        out = out or sys.stdout
+        basename = job['basename']
+        final_out = job['out']
+        
+        effective_output_pdf_name = f"{basename}.pdf"
+        if final_out:
+            if final_out.lower().endswith('.pdf'):
+                effective_output_pdf_name = final_out
+            elif final_out.lower().endswith('.tex'):
+                effective_output_pdf_name = f"{final_out[:-4]}.pdf"
+            else:
+                effective_output_pdf_name = f"{final_out}.pdf"
+        debug(f"Compiling {basename}.tex to {effective_output_pdf_name}")
+        
+        print(f"\n{Colors.HEADER}--- Building Target: {basename}.tex ---{Colors.ENDC}", file=out)
+        
+        rules = generate_build_rules(config, f"{basename}.tex", basename, out)
+        success = build(basename, rules, out)
+        
+        if success:
+            print(f"{Colors.GREEN}================ BUILD SUCCEEDED ================{Colors.ENDC}", file=out)
+            if args.build_clean:
+                # Defer cleaning until all builds are done if -bc is used
+                pass 
+            
+            if final_out:
+                src = f"{basename}.pdf"
+                # Ensure dst always ends with .pdf
+                if final_out.lower().endswith('.pdf'):
+                    dst = final_out
+                elif final_out.lower().endswith('.tex'):
+                    dst = f"{final_out[:-4]}.pdf"
+                else:
+                    dst = f"{final_out}.pdf"
+                
+                if src != dst:
+                    try:
+                        os.replace(src, dst)
+                        print(f"Output: {Colors.GREEN}{dst}{Colors.ENDC}", file=out)
+                    except FileNotFoundError:
+                        pass
+        return success
+
+    def run_jobs_parallel(jobs):
+        # Opt-in via -j, since targets that \include the same file would write
+        # its .aux concurrently. Each job logs into its own buffer, printed as
+        # one block when the job finishes.
+        def run_buffered(job):
+            buf = io.StringIO()
+            return run_job(job, buf), buf.getvalue()
+
+        total_success = True
+        max_workers = min(len(jobs), args.jobs)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(run_buffered, job) for job in jobs]
+            for future in concurrent.futures.as_completed(futures):
+                if future.cancelled():
+                    continue
+                success, log = future.result()
+                sys.stdout.write(log)
+                sys.stdout.flush()
+                if not success:
+                    total_success = False
+                    # Stop on first failure: drop targets that have not started yet.
+                    for pending in futures:
+                        pending.cancel()
+        return total_success
+
     def run_build_cycle():
         if not file_basenames and not args.clean:
              print(f"{Colors.FAIL}Error: No main file found.{Colors.ENDC}", file=sys.stderr); return
@@ -313,49 +512,10 @@ def main():
                     final_out = out_files[i]
                 jobs.append({'basename': basename, 'out': final_out})
         
-        total_success = True
-        for job in jobs:
-            basename = job['basename']
-            final_out = job['out']
-            
-            effective_output_pdf_name = f"{basename}.pdf"
-            if final_out:
-                if final_out.lower().endswith('.pdf'):
-                    effective_output_pdf_name = final_out
-                elif final_out.lower().endswith('.tex'):
-                    effective_output_pdf_name = f"{final_out[:-4]}.pdf"
-                else:
-                    effective_output_pdf_name = f"{final_out}.pdf"
-            debug(f"Compiling {basename}.tex to {effective_output_pdf_name}")
-            
-            print(f"\n{Colors.HEADER}--- Building Target: {basename}.tex ---{Colors.ENDC}")
-            
-            rules = generate_build_rules(config, f"{basename}.tex")
-            success = build(basename, rules)
-            
-            if success:
-                print(f"{Colors.GREEN}================ BUILD SUCCEEDED ================{Colors.ENDC}")
-                if args.build_clean:
-                    # Defer cleaning until all builds are done if -bc is used
-                    pass 
-                
-                if final_out:
-                    src = f"{basename}.pdf"
-                    # Ensure dst always ends with .pdf
-                    if final_out.lower().endswith('.pdf'):
-                        dst = final_out
-                    elif final_out.lower().endswith('.tex'):
-                        dst = f"{final_out[:-4]}.pdf"
-                    else:
-                        dst = f"{final_out}.pdf"
-                    
-                    if Path(src).exists() and Path(src).name != Path(dst).name:
-                        Path(src).rename(dst)
-                        print(f"Output: {Colors.GREEN}{dst}{Colors.ENDC}")
-            else:
-                total_success = False
-                # Stop on first failure
-                break
+        if args.jobs > 1 and len(jobs) > 1:
+            total_success = run_jobs_parallel(jobs)
+        else:
+            total_success = all(run_job(job) for job in jobs)
         
         # Post-build actions
         if args.build_clean and total_success:
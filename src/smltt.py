@@ -6,8 +6,9 @@ Smart Latex Template (smltt) Manager
 Manages local and remote LaTeX project templates.
 
 Usage:
-    smltt register <name> --path <path>
+    smltt register <name> --path <path> [--compress]
     smltt register <name> --url <url> [--download | --lazydownload]
+    smltt register-batch <file> [--download]
     smltt new <project_name> -t <template>
     smltt list
     smltt delete <name>
@@ -17,12 +18,19 @@ Commands:
   register    Register a new template.
               - From a local path:
                   smltt register my-template --path /path/to/template/dir
+                  (stored uncompressed; add --compress to deflate the archive)
               - From a Git repository:
                   smltt register my-git-template --url https://github.com/user/repo.git
               - From a direct URL to a .zip file:
                   smltt register my-zip-template --url http://example.com/template.zip --download
                   (use --lazydownload to download it on first use)
 
+  register-batch
+              Register several URL templates at once, cloning or downloading
+              them concurrently. Each line of <file> is "<name> <url>";
+              blank lines and lines starting with # are ignored.
+                  smltt register-batch templates.txt --download
+
   new         Create a new project from a template.
               smltt new MyNewProject -t my-template
 
@@ -38,31 +46,205 @@ Commands:
 """
 
 import argparse
-import shutil
+import io
 import sys
 import os
 import json
-import urllib.request
-import subprocess
 from pathlib import Path
 
+# orjson is optional; metadata falls back to the stdlib json module.
+try:
+    import orjson
+
+    def _loads(data):
+        return orjson.loads(data)
+
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def _loads(data):
+        return json.loads(data)
+
+    def _dumps(obj):
+        return json.dumps(obj, indent=2).encode('utf-8')
+
 # 模板存储位置: ~/.smartlatex/templates
 TEMPLATE_STORE = Path.home() / ".smartlatex" / "templates"
 
+# Read size for template downloads.
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# Upper bound for a single clone in register-batch, in seconds.
+GIT_CLONE_TIMEOUT = 300
+
 class Colors:
     GREEN = '\033[92m'
     FAIL = '\033[91m'
     ENDC = '\033[0m'
     BOLD = '\033[1m'
 
+_store_ready = False
+
 def init_store():
-    if not TEMPLATE_STORE.exists():
-        TEMPLATE_STORE.mkdir(parents=True, exist_ok=True)
+    global _store_ready
+    if _store_ready:
+        return
+    TEMPLATE_STORE.mkdir(parents=True, exist_ok=True)
+    _store_ready = True
 
 def _write_template_metadata(name, metadata):
     meta_path = TEMPLATE_STORE / f"{name}.json"
-    with open(meta_path, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    # Write a sibling file and rename it over, so readers never see a partial file.
+    tmp_path = meta_path.with_suffix('.json.tmp')
+    tmp_path.write_bytes(_dumps(metadata))
+    os.replace(tmp_path, meta_path)
+
+def _zip_tree(src, dest_zip, compress=False):
+    """Zip the contents of directory `src` into `dest_zip`.
+
+    Templates are small text trees kept on local disk, so by default they are
+    stored without compression; pass `compress=True` to deflate them.
+    """
+    import zipfile
+    src = os.fspath(src)
+    prefix_len = len(src) + 1
+
+    def walk(zf, path):
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        for entry in entries:
+            arcname = entry.path[prefix_len:]
+            # DirEntry.is_dir() uses the type cached by readdir, no extra stat.
+            if entry.is_dir(follow_symlinks=False):
+                zf.write(entry.path, arcname)
+                walk(zf, entry.path)
+            elif entry.is_dir():
+                # Symlink to a directory: recorded, not followed (as make_archive did)
+                zf.write(entry.path, arcname)
+            elif entry.is_file():
+                zf.write(entry.path, arcname)
+            # Anything else (dangling symlinks, FIFOs, sockets) is skipped.
+
+    if compress:
+        zf = zipfile.ZipFile(dest_zip, 'w', zipfile.ZIP_DEFLATED, compresslevel=1)
+    else:
+        zf = zipfile.ZipFile(dest_zip, 'w', zipfile.ZIP_STORED)
+    with zf:
+        walk(zf, src)
+
+def _spawn(args):
+    """Run a command and capture its output; returns (returncode, stdout, stderr).
+
+    Uses os.posix_spawnp where available, which skips the fork machinery of
+    subprocess; other platforms fall back to subprocess.run.
+    """
+    if not hasattr(os, 'posix_spawnp'):
+        import subprocess
+        result = subprocess.run(args, capture_output=True, text=True)
+        return result.returncode, result.stdout, result.stderr
+
+    import selectors
+    import signal
+    out_r, out_w = os.pipe()
+    err_r, err_w = os.pipe()
+    try:
+        pid = os.posix_spawnp(args[0], args, os.environ, file_actions=[
+            (os.POSIX_SPAWN_DUP2, out_w, 1),
+            (os.POSIX_SPAWN_DUP2, err_w, 2),
+        # Python ignores these; restore the defaults for the child, as subprocess does.
+        ], setsigdef=(signal.SIGPIPE, signal.SIGXFSZ))
+    except OSError:
+        os.close(out_r)
+        os.close(err_r)
+        raise
+    finally:
+        os.close(out_w)
+        os.close(err_w)
+
+    # Drain both pipes together so neither can fill up and stall the child.
+    chunks = {out_r: [], err_r: []}
+    with selectors.DefaultSelector() as sel:
+        sel.register(out_r, selectors.EVENT_READ)
+        sel.register(err_r, selectors.EVENT_READ)
+        while sel.get_map():
+            for key, _ in sel.select():
+                data = os.read(key.fd, 65536)
+                if data:
+                    chunks[key.fd].append(data)
+                else:
+                    sel.unregister(key.fd)
+                    os.close(key.fd)
+
+    _, status = os.waitpid(pid, 0)
+    returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+    return (returncode,
+            b''.join(chunks[out_r]).decode('utf-8', 'replace'),
+            b''.join(chunks[err_r]).decode('utf-8', 'replace'))
+
+def _git_clone_cmd(url, dest_path):
+    # Only the latest snapshot is needed, so skip the history.
+    return ["git", "clone", "--depth", "1", "--single-branch", url, str(dest_path)]
+
+def _fast_copytree(src, dst, ignore=None):
+    """Like shutil.copytree, but copies files concurrently on a thread pool.
+
+    The tree is walked and directories are created in order; only the
+    per-file copies are handed to workers, so their IO overlaps. Directory
+    modes are applied once every copy has finished, so read-only directories
+    do not block their own contents. Permission bits are kept, but timestamps
+    are intentionally not preserved: a new project is a fresh scaffold.
+    """
+    import concurrent.futures
+    import shutil
+    dirs = []
+
+    def walk(pool, copies, src_dir, dst_dir):
+        with os.scandir(src_dir) as it:
+            entries = list(it)
+        ignored = ignore(src_dir, [e.name for e in entries]) if ignore else ()
+        os.makedirs(dst_dir)
+        dirs.append((src_dir, dst_dir))
+        for entry in entries:
+            if entry.name in ignored:
+                continue
+            target = os.path.join(dst_dir, entry.name)
+            # Symlinks are followed, as copytree does by default.
+            if entry.is_dir():
+                walk(pool, copies, entry.path, target)
+            else:
+                copies.append(pool.submit(shutil.copy, entry.path, target))
+
+    with concurrent.futures.ThreadPoolExecutor() as pool:
+        copies = []
+        walk(pool, copies, os.fspath(src), os.fspath(dst))
+        for copy in copies:
+            copy.result()
+    # Deepest first, so a parent never turns read-only before its children.
+    for src_dir, dst_dir in reversed(dirs):
+        shutil.copymode(src_dir, dst_dir)
+
+def _parallel_rmtree(path):
+    """Remove a directory tree, unlinking the files of each directory concurrently."""
+    import concurrent.futures
+    with concurrent.futures.ThreadPoolExecutor(max_workers=(os.cpu_count() or 1) * 4) as pool:
+        # Bottom-up, so every directory is empty by the time it is removed.
+        for root, dirs, files in os.walk(path, topdown=False):
+            list(pool.map(os.unlink, [os.path.join(root, f) for f in files]))
+            for d in dirs:
+                dir_path = os.path.join(root, d)
+                # os.walk lists symlinks to directories under `dirs` without following them
+                if os.path.islink(dir_path):
+                    os.unlink(dir_path)
+                else:
+                    os.rmdir(dir_path)
+    os.rmdir(path)
+
+def _extract_zip(zip_path, dest):
+    import zipfile
+    with zipfile.ZipFile(zip_path) as zf:
+        # Extract in on-disk order so reads through the archive stay sequential.
+        members = sorted(zf.infolist(), key=lambda info: info.header_offset)
+        zf.extractall(dest, members)
 
 def _register_from_path(args):
     src_path = Path(args.path).resolve()
@@ -70,32 +252,77 @@ def _register_from_path(args):
         print(f"{Colors.FAIL}Error: Source path '{src_path}' does not exist or is not a directory.{Colors.ENDC}")
         sys.exit(1)
 
-    dest_archive_base = TEMPLATE_STORE / args.name
+    dest_zip = TEMPLATE_STORE / f"{args.name}.zip"
     try:
-        shutil.make_archive(str(dest_archive_base), 'zip', str(src_path))
+        _zip_tree(src_path, dest_zip, compress=args.compress)
         _write_template_metadata(args.name, {'source': 'local', 'path': str(src_path)})
         print(f"{Colors.GREEN}Template '{args.name}' registered successfully from path '{src_path}'.{Colors.ENDC}")
     except Exception as e:
+        # Do not leave a truncated archive behind to block a retry.
+        if dest_zip.exists():
+            dest_zip.unlink()
         print(f"{Colors.FAIL}Error registering template: {e}{Colors.ENDC}")
         sys.exit(1)
 
-def _download_template(name, url):
+def _save_template_zip(name, url, fetch):
+    """Download `url` into the store as `<name>.zip` via `fetch(resp, f)`.
+
+    The data lands in a .part file next to the target and is renamed into
+    place, so a failed download never clobbers a previously good zip.
+    Returns what `fetch` returned, or None if the download failed.
+    """
+    import urllib.request
     dest_zip = TEMPLATE_STORE / f"{name}.zip"
+    part_zip = dest_zip.with_suffix('.zip.part')
     print(f"Downloading template '{name}' from {url}...")
     try:
-        urllib.request.urlretrieve(url, dest_zip)
-        # Update metadata if it exists
-        meta_path = TEMPLATE_STORE / f"{name}.json"
-        if meta_path.exists():
-            with open(meta_path, 'r+') as f:
-                metadata = json.load(f)
-                metadata['status'] = 'downloaded'
-                f.seek(0)
-                json.dump(metadata, f, indent=2)
-        return True
+        with urllib.request.urlopen(url) as resp, open(part_zip, 'wb') as f:
+            result = fetch(resp, f)
+        os.replace(part_zip, dest_zip)
+        _mark_downloaded(name)
+        return result
     except Exception as e:
+        if part_zip.exists():
+            part_zip.unlink()
         print(f"{Colors.FAIL}Error downloading template: {e}{Colors.ENDC}")
-        return False
+        return None
+
+def _stream_to_file(resp, f):
+    import shutil
+    # Only HTTP responses carry a length; file:// and ftp:// ones do not.
+    length = getattr(resp, 'length', None)
+    if length and hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), 0, length)
+        except OSError:
+            pass  # Not supported by every filesystem
+    shutil.copyfileobj(resp, f, DOWNLOAD_CHUNK_SIZE)
+    f.truncate()
+    return True
+
+def _read_to_file(resp, f):
+    data = resp.read()
+    f.write(data)
+    return data
+
+def _download_template(name, url):
+    return _save_template_zip(name, url, _stream_to_file) is not None
+
+def _download_template_in_memory(name, url):
+    """Download a template zip and return its bytes, also saving it to the store.
+
+    For callers that extract right away: they can read the archive from the
+    returned bytes instead of reading the saved zip back from disk.
+    """
+    return _save_template_zip(name, url, _read_to_file)
+
+def _mark_downloaded(name):
+    # Update metadata if it exists
+    meta_path = TEMPLATE_STORE / f"{name}.json"
+    if meta_path.exists():
+        metadata = _loads(meta_path.read_bytes())
+        metadata['status'] = 'downloaded'
+        _write_template_metadata(name, metadata)
 
 def _register_from_url(args):
     url = args.url
@@ -108,10 +335,10 @@ def _register_from_url(args):
         
         dest_path = TEMPLATE_STORE / name
         print(f"Cloning git repository from {url}...")
-        # Using subprocess to run git clone for better error handling
-        result = subprocess.run(["git", "clone", url, str(dest_path)], capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"{Colors.FAIL}Error cloning repository:\n{result.stderr}{Colors.ENDC}")
+        # Run git clone as a child process for better error handling
+        returncode, _, stderr = _spawn(_git_clone_cmd(url, dest_path))
+        if returncode != 0:
+            print(f"{Colors.FAIL}Error cloning repository:\n{stderr}{Colors.ENDC}")
             sys.exit(1)
         
         _write_template_metadata(name, {"source": "git", "url": url})
@@ -132,14 +359,43 @@ def _register_from_url(args):
             print(f"{Colors.GREEN}Template '{name}' registered for lazy download.{Colors.ENDC}")
             print("It will be downloaded the first time you use it.")
 
+def _scan_store():
+    """List the template store once; each DirEntry keeps the type readdir reported."""
+    with os.scandir(TEMPLATE_STORE) as it:
+        return list(it)
+
+def _probe(name, entries=None):
+    """Report which of a template's assets exist, using one directory scan.
+
+    Pass `entries` from _scan_store() to reuse one scan for many names.
+    """
+    if entries is None:
+        entries = _scan_store()
+    found = {'dir': False, 'zip': False, 'meta': False}
+    assets = {'dir': name, 'zip': f"{name}.zip", 'meta': f"{name}.json"}
+    folded = {kind: asset.casefold() for kind, asset in assets.items()}
+    for entry in entries:
+        for kind, asset in assets.items():
+            if entry.name == asset:
+                exists = entry.is_dir() if kind == 'dir' else entry.is_file()
+            elif entry.name.casefold() == folded[kind]:
+                # Differs only in case: whether it is the same file depends on
+                # the filesystem (macOS and Windows ignore case), so ask it.
+                path = TEMPLATE_STORE / asset
+                exists = path.is_dir() if kind == 'dir' else path.is_file()
+            else:
+                continue
+            found[kind] = found[kind] or exists
+    return found
+
+def _template_exists(name, entries=None):
+    return any(_probe(name, entries).values())
+
 def cmd_register(args):
     init_store()
     template_name = args.name
-    template_zip_path = TEMPLATE_STORE / f"{template_name}.zip"
-    template_dir_path = TEMPLATE_STORE / template_name
-    template_meta_path = TEMPLATE_STORE / f"{template_name}.json"
 
-    if template_zip_path.exists() or template_dir_path.exists() or template_meta_path.exists():
+    if _template_exists(template_name):
         print(f"{Colors.FAIL}Error: Template '{template_name}' already exists.{Colors.ENDC}")
         sys.exit(1)
 
@@ -152,7 +408,103 @@ def cmd_register(args):
         print(f"{Colors.FAIL}Error: You must specify either a --path or a --url.{Colors.ENDC}")
         sys.exit(1)
 
+async def _clone_async(name, url, limit):
+    import asyncio
+    import shutil
+    dest_path = TEMPLATE_STORE / name
+    async with limit:
+        proc = await asyncio.create_subprocess_exec(*_git_clone_cmd(url, dest_path),
+                                                    stdout=asyncio.subprocess.PIPE,
+                                                    stderr=asyncio.subprocess.PIPE)
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), timeout=GIT_CLONE_TIMEOUT)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            shutil.rmtree(dest_path, ignore_errors=True)
+            return f"git clone timed out after {GIT_CLONE_TIMEOUT}s"
+    if proc.returncode != 0:
+        return f"Error cloning repository:\n{stderr.decode('utf-8', 'replace')}"
+    _write_template_metadata(name, {"source": "git", "url": url})
+    return None
+
+async def _download_async(name, url):
+    import asyncio
+    # urllib is blocking; run it on the default executor so downloads overlap.
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(None, _download_template, name, url):
+        return "Download failed"
+    _write_template_metadata(name, {"source": "url", "url": url, "status": "downloaded"})
+    return None
+
+async def _register_lazy_async(name, url):
+    # Lazy URL templates need no network access, just metadata.
+    _write_template_metadata(name, {"source": "url", "url": url, "status": "lazy"})
+    return None
+
+async def _register_batch(entries, download):
+    """Register all entries concurrently; returns one error message (or None) per entry."""
+    import asyncio
+    # Cap concurrent clones like the default executor caps downloads, so a
+    # long batch file cannot exhaust processes or file descriptors.
+    clone_limit = asyncio.Semaphore(min(32, (os.cpu_count() or 1) + 4))
+    jobs = []
+    for name, url in entries:
+        if url.endswith('.git'):
+            jobs.append(_clone_async(name, url, clone_limit))
+        elif download:
+            jobs.append(_download_async(name, url))
+        else:
+            jobs.append(_register_lazy_async(name, url))
+    return await asyncio.gather(*jobs)
+
+def cmd_register_batch(args):
+    import asyncio
+    init_store()
+    entries = []
+    try:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        print(f"{Colors.FAIL}Error reading batch file: {e}{Colors.ENDC}")
+        sys.exit(1)
+
+    for lineno, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        parts = line.split()
+        if len(parts) != 2:
+            print(f"{Colors.FAIL}Error: {args.file}:{lineno}: expected '<name> <url>'.{Colors.ENDC}")
+            sys.exit(1)
+        entries.append((parts[0], parts[1]))
+
+    # Validate everything up front so a bad entry does not leave a half-done batch.
+    # The store is scanned once and shared by every name. Names that differ
+    # only in case count as duplicates, as they would collide on macOS and Windows.
+    store_entries = _scan_store()
+    seen = set()
+    for name, _ in entries:
+        if name.casefold() in seen or _template_exists(name, store_entries):
+            print(f"{Colors.FAIL}Error: Template '{name}' already exists or is listed twice.{Colors.ENDC}")
+            sys.exit(1)
+        seen.add(name.casefold())
+
+    print(f"Registering {len(entries)} templates...")
+    errors = asyncio.run(_register_batch(entries, args.download))
+
+    failed = False
+    for (name, url), error in zip(entries, errors):
+        if error:
+            failed = True
+            print(f"{Colors.FAIL}  - {name}: {error}{Colors.ENDC}")
+        else:
+            print(f"{Colors.GREEN}  - {name}: registered from {url}{Colors.ENDC}")
+    if failed:
+        sys.exit(1)
+
 def cmd_new(args):
+    import shutil
     init_store()
     template_name = args.template
     project_path = Path(args.project_name).resolve()
@@ -164,29 +516,27 @@ def cmd_new(args):
     template_dir = TEMPLATE_STORE / template_name
     template_zip = TEMPLATE_STORE / f"{template_name}.zip"
     template_meta = TEMPLATE_STORE / f"{template_name}.json"
+    found = _probe(template_name)
 
     try:
-        if template_dir.is_dir():
+        if found['dir']:
             print(f"Creating project '{args.project_name}' from git template '{template_name}'...")
-            # Ignore .git directory when copying
-            shutil.copytree(template_dir, project_path, ignore=shutil.ignore_patterns('.git'))
-        elif template_zip.is_file():
+            # Ignore repository metadata when copying
+            _fast_copytree(template_dir, project_path, ignore=shutil.ignore_patterns('.git', '.github'))
+        elif found['zip']:
             print(f"Creating project '{args.project_name}' from template '{template_name}'...")
-            shutil.unpack_archive(str(template_zip), str(project_path), 'zip')
-        elif template_meta.is_file():
-            with open(template_meta, 'r') as f:
-                metadata = json.load(f)
+            _extract_zip(template_zip, project_path)
+        elif found['meta']:
+            metadata = _loads(template_meta.read_bytes())
             if metadata.get('source') == 'url' and metadata.get('status') == 'lazy':
                 print(f"Template '{template_name}' is a lazy URL, downloading now.")
-                if not _download_template(template_name, metadata['url']):
-                    sys.exit(1)
-                # After download, the zip file should exist
-                if template_zip.is_file():
-                    print(f"Creating project '{args.project_name}' from template '{template_name}'...")
-                    shutil.unpack_archive(str(template_zip), str(project_path), 'zip')
-                else:
-                    print(f"{Colors.FAIL}Error: Failed to find downloaded template zip file.{Colors.ENDC}")
+                data = _download_template_in_memory(template_name, metadata['url'])
+                if data is None:
                     sys.exit(1)
+                # The zip is kept in the store for later projects, but this one
+                # is extracted straight from memory.
+                print(f"Creating project '{args.project_name}' from template '{template_name}'...")
+                _extract_zip(io.BytesIO(data), project_path)
             else:
                 print(f"{Colors.FAIL}Error: Invalid metadata for template '{template_name}'.{Colors.ENDC}")
                 sys.exit(1)
@@ -212,41 +562,47 @@ def cmd_list(args):
     init_store()
     templates = {}
 
-    for p in TEMPLATE_STORE.iterdir():
-        if p.is_dir():
-            templates[p.name] = {'status': 'git'}
-        elif p.suffix == '.zip':
-            name = p.stem
-            if name not in templates:
-                templates[name] = {}
-            templates[name]['zip'] = True
-        elif p.suffix == '.json':
-            name = p.stem
-            if name not in templates:
-                templates[name] = {}
-            templates[name]['meta'] = p
+    # DirEntry caches the file type from readdir, so no per-entry stat.
+    with os.scandir(TEMPLATE_STORE) as it:
+        for entry in it:
+            name = entry.name
+            if entry.is_dir():
+                templates.setdefault(name, {})['status'] = 'git'
+            elif name.endswith('.zip'):
+                templates.setdefault(name[:-4], {})['zip'] = True
+            elif name.endswith('.json'):
+                # Parsed only where the listing needs it (not for git repos).
+                templates.setdefault(name[:-5], {})['meta'] = entry.path
 
     if not templates:
         print("No templates registered.")
         return
 
+    def read_meta(path):
+        try:
+            with open(path, 'rb') as f:
+                return _loads(f.read())
+        except (OSError, ValueError):
+            return None
+
     print(f"{Colors.BOLD}Available Templates:{Colors.ENDC}")
-    for name in sorted(templates.keys()):
-        info = templates[name]
+    for name, info in sorted(templates.items()):
         status = info.get('status')
         if status == 'git':
             details = '(git repo)'
         elif 'zip' in info:
             details = '(local)'
             if 'meta' in info:
-                with open(info['meta'], 'r') as f:
-                    meta = json.load(f)
-                if meta.get('source') == 'url':
+                meta = read_meta(info['meta'])
+                if meta is None:
+                    details = '(unknown)'
+                elif meta.get('source') == 'url':
                     details = '(url, downloaded)'
         elif 'meta' in info:
-            with open(info['meta'], 'r') as f:
-                meta = json.load(f)
-            if meta.get('status') == 'lazy':
+            meta = read_meta(info['meta'])
+            if meta is None:
+                details = '(unknown)'
+            elif meta.get('status') == 'lazy':
                 details = '(url, lazy download)'
             else:
                 details = '(meta only)'
@@ -261,21 +617,22 @@ def cmd_delete(args):
     template_dir = TEMPLATE_STORE / name
     template_zip = TEMPLATE_STORE / f"{name}.zip"
     template_meta = TEMPLATE_STORE / f"{name}.json"
+    assets = _probe(name)
 
     found = False
-    if template_dir.exists():
+    if assets['dir']:
         found = True
         try:
-            shutil.rmtree(template_dir)
+            _parallel_rmtree(template_dir)
         except Exception as e:
             print(f"{Colors.FAIL}Error removing directory {template_dir}: {e}{Colors.ENDC}")
             sys.exit(1)
             
-    if template_zip.exists():
+    if assets['zip']:
         found = True
         template_zip.unlink()
         
-    if template_meta.exists():
+    if assets['meta']:
         found = True
         template_meta.unlink()
 
@@ -289,36 +646,38 @@ def cmd_update(args):
     init_store()
     name = args.name
     meta_path = TEMPLATE_STORE / f"{name}.json"
+    found = _probe(name)
 
-    if not meta_path.exists():
+    if not found['meta']:
         # Check if it's a legacy local template (zip only, no meta)
-        if (TEMPLATE_STORE / f"{name}.zip").exists():
+        if found['zip']:
             print(f"Template '{name}' is a local template and cannot be automatically updated.")
         else:
             print(f"{Colors.FAIL}Template '{name}' not found or has no metadata for updating.{Colors.ENDC}")
         sys.exit(1)
 
-    with open(meta_path, 'r') as f:
-        metadata = json.load(f)
+    metadata = _loads(meta_path.read_bytes())
 
     source_type = metadata.get('source')
     url = metadata.get('url')
 
     if source_type == 'git':
         template_dir = TEMPLATE_STORE / name
-        if not template_dir.is_dir():
+        if not found['dir']:
             print(f"{Colors.FAIL}Error: Git template directory not found at '{template_dir}'.{Colors.ENDC}")
             sys.exit(1)
         
         print(f"Updating git template '{name}' from {url}...")
-        # Change directory and run git pull
+        # Fetch only the new tip and move onto it, so the clone stays shallow
         try:
-            result = subprocess.run(["git", "-C", str(template_dir), "pull"], check=True, capture_output=True, text=True)
-            print(result.stdout)
+            returncode, stdout, stderr = _spawn(["git", "-C", str(template_dir), "fetch", "--depth", "1", "origin"])
+            if returncode == 0:
+                returncode, stdout, stderr = _spawn(["git", "-C", str(template_dir), "reset", "--hard", "FETCH_HEAD"])
+            if returncode != 0:
+                print(f"{Colors.FAIL}Error updating git repository:\n{stderr}{Colors.ENDC}")
+                sys.exit(1)
+            print(stdout)
             print(f"{Colors.GREEN}Template '{name}' updated successfully.{Colors.ENDC}")
-        except subprocess.CalledProcessError as e:
-            print(f"{Colors.FAIL}Error updating git repository:\n{e.stderr}{Colors.ENDC}")
-            sys.exit(1)
         except Exception as e:
             print(f"{Colors.FAIL}An unexpected error occurred: {e}{Colors.ENDC}")
             sys.exit(1)
@@ -338,11 +697,7 @@ def cmd_update(args):
         print(f"{Colors.FAIL}Unknown template source type: {source_type}{Colors.ENDC}")
         sys.exit(1)
 
-def main():
-    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
-    subparsers = parser.add_subparsers(dest='command', required=True)
-
-    # Register
+def _add_register_parser(subparsers):
     p_reg = subparsers.add_parser('register', help='Register a new template')
     p_reg.add_argument('name', help='Name for the template')
     source_group = p_reg.add_mutually_exclusive_group(required=True)
@@ -352,28 +707,58 @@ def main():
     download_group = p_reg.add_mutually_exclusive_group()
     download_group.add_argument('--download', action='store_true', help='Download the template immediately (for non-git URLs)')
     download_group.add_argument('--lazydownload', action='store_true', help='Download the template when used for the first time (for non-git URLs)')
+    p_reg.add_argument('--compress', action='store_true', help='Deflate the archive of a --path template (stored uncompressed by default)')
     p_reg.set_defaults(func=cmd_register)
 
-    # New
+def _add_register_batch_parser(subparsers):
+    p_batch = subparsers.add_parser('register-batch', help='Register several URL templates concurrently')
+    p_batch.add_argument('file', help='File with one "<name> <url>" pair per line')
+    p_batch.add_argument('--download', action='store_true', help='Download non-git templates immediately instead of lazily')
+    p_batch.set_defaults(func=cmd_register_batch)
+
+def _add_new_parser(subparsers):
     p_new = subparsers.add_parser('new', help='Create a new project from a template')
     p_new.add_argument('project_name', help='Name of the new project directory')
     p_new.add_argument('--template', '-t', required=True, help='Name of the template to use')
     p_new.set_defaults(func=cmd_new)
 
-    # List
+def _add_list_parser(subparsers):
     p_list = subparsers.add_parser('list', help='List registered templates')
     p_list.set_defaults(func=cmd_list)
 
-    # Delete
+def _add_delete_parser(subparsers):
     p_del = subparsers.add_parser('delete', help='Delete a registered template')
     p_del.add_argument('name', help='Name of the template to delete')
     p_del.set_defaults(func=cmd_delete)
 
-    # Update
+def _add_update_parser(subparsers):
     p_upd = subparsers.add_parser('update', help='Update an existing template from its source (git or URL)')
     p_upd.add_argument('name', help='Name of the template to update')
     p_upd.set_defaults(func=cmd_update)
 
+# Sub-parser builders, in the order they appear in --help.
+_PARSER_BUILDERS = {
+    'register': _add_register_parser,
+    'register-batch': _add_register_batch_parser,
+    'new': _add_new_parser,
+    'list': _add_list_parser,
+    'delete': _add_delete_parser,
+    'update': _add_update_parser,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    if command in _PARSER_BUILDERS:
+        # Only build the sub-parser that is actually going to run.
+        _PARSER_BUILDERS[command](subparsers)
+    else:
+        # -h, a missing or an unknown command: build all of them for help and errors.
+        for add_parser in _PARSER_BUILDERS.values():
+            add_parser(subparsers)
+
     args = parser.parse_args()
     args.func(args)
 